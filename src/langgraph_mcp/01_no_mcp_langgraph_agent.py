@@ -1,8 +1,11 @@
+import os
+import json
+import hashlib
+from pathlib import Path
 from langchain_core.messages import HumanMessage, AnyMessage
 from langgraph.graph import StateGraph, START
 from langgraph.prebuilt import tools_condition, ToolNode
-from pydantic import BaseModel
-from typing import Annotated, List
+from typing import Annotated, List, TypedDict
 from langgraph.graph.message import add_messages
 from langgraph.checkpoint.memory import MemorySaver
 from langgraph_mcp.configuration import get_llm
@@ -19,6 +22,9 @@ Example:
   Assistant: "The result of adding 3 and 4 is 7"
 """
 
+GRAPH_PNG_PATH = Path(__file__).parent / "graph_visualisation" / "model_graph.png"
+GRAPH_HASH_PATH = GRAPH_PNG_PATH.with_suffix(".hash")
+
 
 def multiply(a: int, b: int) -> int:
     """Multiply a and b.
@@ -51,13 +57,13 @@ def divide(a: int, b: int) -> float:
 
 
 # Define the state of the graph.
-class MessageState(BaseModel):
+class MessageState(TypedDict):
     messages: Annotated[List[AnyMessage], add_messages]
 
 
 def assistant(state: MessageState):
-    state.messages = llm_with_tools.invoke(state.messages)
-    return state
+    response = llm_with_tools.invoke(state["messages"])
+    return {"messages": [response]}
 
 
 def build_graph(tools):
@@ -77,11 +83,24 @@ def build_graph(tools):
     memory = MemorySaver()
     react_graph_memory = builder.compile(checkpointer=memory)
 
-    # Visualise the graph
-    png_bytes = react_graph_memory.get_graph().draw_mermaid_png()
-    with open("src/langgraph_mcp/graph_visualisation/model_graph.png", "wb") as f:
-        f.write(png_bytes)
-        return react_graph_memory
+    # Visualise the graph (opt-in: draw_mermaid_png does an HTTP request to mermaid.ink)
+    if os.getenv("RENDER_GRAPH") == "1":
+        _persist_graph_png(react_graph_memory)
+
+    return react_graph_memory
+
+
+def _persist_graph_png(compiled_graph):
+    """Write the Mermaid PNG of the graph, only re-rendering when its structure changed"""
+    graph = compiled_graph.get_graph()
+    graph_hash = hashlib.blake2b(
+        json.dumps(graph.to_json(), sort_keys=True, default=str).encode()
+    ).hexdigest()
+    if GRAPH_HASH_PATH.exists() and GRAPH_HASH_PATH.read_text() == graph_hash:
+        return
+
+    GRAPH_PNG_PATH.write_bytes(graph.draw_mermaid_png())
+    GRAPH_HASH_PATH.write_text(graph_hash)
 
 
 if __name__ == "__main__":
@@ -100,11 +119,11 @@ if __name__ == "__main__":
     config = {"configurable": {"thread_id": "1"}}
 
     # setup input state for the graph
-    input_state = MessageState(
-        messages=[
+    input_state = {
+        "messages": [
             HumanMessage(content="Please, make a word document where you add 3 and 4")
         ]
-    )
+    }
 
     # Run the graph with the input state and the config from the langraph
     result = react_graph_memory.invoke(input_state, config)
@@ -3,12 +3,10 @@ from pathlib import Path
 from langchain_core.messages import HumanMessage, AnyMessage
 from langgraph.graph import StateGraph, START
 from langgraph.prebuilt import tools_condition, ToolNode
-from pydantic import BaseModel
-from typing import Annotated, List
+from typing import Annotated, List, TypedDict
 from langgraph.graph.message import add_messages
-from langgraph.checkpoint.memory import MemorySaver
 from langchain_mcp_adapters.client import MultiServerMCPClient
-from langgraph_mcp.configuration import get_llm
+from langgraph_mcp.configuration import get_llm_with_tools, toolset_key
 
 """
 LangGraph ReAct Agent with Multiple MCP Servers
@@ -24,7 +22,7 @@ Example:
 
 
 # Define the state of the graph.
-class MessageState(BaseModel):
+class MessageState(TypedDict):
     messages: Annotated[List[AnyMessage], add_messages]
 
 
@@ -32,16 +30,23 @@ def create_assistant(llm_with_tools):
     """Create an assistant function with access to the LLM"""
 
     async def assistant(state: MessageState):
-        state.messages = await llm_with_tools.ainvoke(state.messages)
-        return state
+        response = await llm_with_tools.ainvoke(state["messages"])
+        return {"messages": [response]}
 
     return assistant
 
 
+# Compiled graphs keyed by toolset, so later run_mcp_agent calls skip recompiling
+_compiled_graphs = {}
+
+
 def build_graph(tools):
-    """Build and return the LangGraph ReAct agent with MCP tools"""
-    llm = get_llm("openai")
-    llm_with_tools = llm.bind_tools(tools)
+    """Build and return the LangGraph ReAct agent with MCP tools (cached per toolset)"""
+    key = toolset_key(tools)
+    if key in _compiled_graphs:
+        return _compiled_graphs[key]
+
+    llm_with_tools = get_llm_with_tools(tools, "openai")
 
     builder = StateGraph(MessageState)
     # Define nodes
@@ -56,23 +61,40 @@ def build_graph(tools):
     # note: The tool call output will be sent back to the assistant node (to 'summarize' the tool call)
     builder.add_edge("tools", "assistant")
 
-    memory = MemorySaver()
-    react_graph_memory = builder.compile(checkpointer=memory)
-    return react_graph_memory
+    # No checkpointer: every run_mcp_agent call is a single-shot question that is never
+    # resumed, so saving a checkpoint after every step would be pure overhead
+    _compiled_graphs[key] = builder.compile()
+    return _compiled_graphs[key]
 
 
-async def validate_servers(all_servers):
-    """Validate and filter MCP servers, returning only successful ones"""
-    successful_servers = {}
-    for server_name, server_config in all_servers.items():
+async def validate_servers(client):
+    """Validate the client's MCP servers, dropping failing ones and returning the tools per server"""
+
+    async def probe(server_name):
         try:
-            test_client = MultiServerMCPClient({server_name: server_config})
-            await test_client.get_tools()
-            successful_servers[server_name] = server_config
-            print(f"Successfully loaded: {server_name}")
+            return await client.get_tools(server_name=server_name), None
         except Exception as e:
-            print(f"Failed to load {server_name}: {e}")
-    return successful_servers
+            return None, e
+
+    server_names = list(client.connections)
+    # Probe all servers concurrently, so startup only waits for the slowest one
+    results = await asyncio.gather(*(probe(name) for name in server_names))
+
+    server_tools = {}
+    for server_name, (tools, error) in zip(server_names, results):
+        if error is None:
+            server_tools[server_name] = tools
+            print(f"Successfully loaded: {server_name}")
+        else:
+            # Drop the failing server so the client only keeps working connections
+            del client.connections[server_name]
+            print(f"Failed to load {server_name}: {error}")
+    return server_tools
+
+
+# Tools per server keyed by the server configs, so later run_mcp_agent calls skip the
+# tools/list round-trip (tool schemas don't change between questions)
+_tools_cache = {}
 
 
 async def run_mcp_agent(input_state):
@@ -92,39 +114,61 @@ async def run_mcp_agent(input_state):
         },
     }
 
-    successful_servers = await validate_servers(all_servers)
-
-    if successful_servers:
-        client = MultiServerMCPClient(successful_servers)
-        tools = await client.get_tools()
-
-        print(
-            f"Loaded {len(tools)} MCP tools from {len(successful_servers)} server(s):"
-        )
-        for tool in tools:
-            print(f"  - {tool.name}: {tool.description}")
+    key = frozenset(
+        (name, config["command"], tuple(config["args"]))
+        for name, config in all_servers.items()
+    )
+    server_tools = _tools_cache.get(key)
+    if server_tools is None:
+        client = MultiServerMCPClient(all_servers)
+        server_tools = await validate_servers(client)
+        # Only cache when every server loaded, so a server that failed is tried again next run
+        if len(server_tools) == len(all_servers):
+            _tools_cache[key] = server_tools
+
+    if server_tools:
+        # Reuse the tools fetched while validating instead of loading them again
+        tools = [tool for loaded in server_tools.values() for tool in loaded]
+
+        print(f"Loaded {len(tools)} MCP tools from {len(server_tools)} server(s):")
+        # One write for the whole listing instead of a print per tool
+        print("\n".join(f"  - {tool.name}: {tool.description}" for tool in tools))
     else:
         print("No servers loaded! Terminating.")
         raise RuntimeError("No MCP servers available")
 
     graph = build_graph(tools)
-    config = {"configurable": {"thread_id": "1"}}
 
     # Test with math question
-    result = await graph.ainvoke(input_state, config)
+    result = await graph.ainvoke(input_state)
 
     return result
 
 
-if __name__ == "__main__":
+async def main():
+    """Ask the example questions on one event loop, which the cached LLM client is bound to"""
     input_state = {"messages": [HumanMessage(content="What's (3 + 5) * 12?")]}
-    result = asyncio.run(run_mcp_agent(input_state))
+    result = await run_mcp_agent(input_state)
     for m in result["messages"]:
         m.pretty_print()
 
     input_state = {
         "messages": [HumanMessage(content="What's the weather forecast in london?")]
     }
-    result = asyncio.run(run_mcp_agent(input_state))
+    result = await run_mcp_agent(input_state)
     for m in result["messages"]:
         m.pretty_print()
+
+
+if __name__ == "__main__":
+    # uvloop (installed with uvicorn[standard], not available on Windows) speeds up the
+    # stdio round-trips to the MCP servers; fall back to the default asyncio loop without it
+    try:
+        import uvloop
+
+        loop_factory = uvloop.new_event_loop
+    except ImportError:
+        loop_factory = None
+
+    # A single asyncio.run: the cached AzureChatOpenAI's HTTP pool can't move to a new loop
+    asyncio.run(main(), loop_factory=loop_factory)
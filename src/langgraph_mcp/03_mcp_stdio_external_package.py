@@ -1,18 +1,19 @@
-from fastapi import FastAPI, Form, Request
+from fastapi import FastAPI, Request
 from fastapi.responses import RedirectResponse
 from fastapi.staticfiles import StaticFiles
 import os
-from contextlib import asynccontextmanager
+from contextlib import asynccontextmanager, AsyncExitStack
 from pathlib import Path
 from langgraph.graph import StateGraph, START
 from langgraph.prebuilt import tools_condition, ToolNode
-from pydantic import BaseModel
-from typing import Annotated, List
+from typing import Annotated, List, TypedDict
 from langgraph.graph.message import add_messages
-from langgraph.checkpoint.memory import MemorySaver
+from langgraph.checkpoint.sqlite.aio import AsyncSqliteSaver
 from langchain_mcp_adapters.client import MultiServerMCPClient
-from langgraph_mcp.configuration import get_llm
+from langchain_mcp_adapters.tools import load_mcp_tools
+from langgraph_mcp.configuration import get_llm_with_tools
 from langgraph_mcp.streaming_utils import (
+    ChatRequest,
     chat_endpoint_handler,
     truncate_messages_safely,
 )
@@ -35,9 +36,16 @@ Example:
 # put verbose to true to see chat and tool results in terminal
 VERBOSE = True
 
+# SQLite file the conversation checkpoints are stored in (survives restarts, shared by workers),
+# by default in the repository root whatever directory the app is started from
+CHECKPOINT_DB = os.getenv(
+    "CHECKPOINT_DB",
+    os.path.join(os.path.dirname(__file__), "..", "..", "checkpoints.db"),
+)
+
 
 # Define the state of the graph
-class MessageState(BaseModel):
+class MessageState(TypedDict):
     messages: Annotated[List, add_messages]
 
 
@@ -45,17 +53,16 @@ def create_assistant(llm_with_tools):
     """Create an assistant function with access to the LLM"""
 
     async def assistant(state: MessageState):
-        messages = truncate_messages_safely(state.messages)
+        messages = truncate_messages_safely(state["messages"])
         response = await llm_with_tools.ainvoke(messages)
         return {"messages": [response]}
 
     return assistant
 
 
-def build_graph(tools):
+def build_graph(tools, checkpointer):
     """Build and return the LangGraph ReAct agent with MCP tools"""
-    llm = get_llm("openai")
-    llm_with_tools = llm.bind_tools(tools)
+    llm_with_tools = get_llm_with_tools(tools, "openai")
 
     builder = StateGraph(MessageState)
     builder.add_node("assistant", create_assistant(llm_with_tools))
@@ -65,26 +72,34 @@ def build_graph(tools):
     builder.add_conditional_edges("assistant", tools_condition)
     builder.add_edge("tools", "assistant")
 
-    memory = MemorySaver()
-    return builder.compile(checkpointer=memory)
+    return builder.compile(checkpointer=checkpointer)
 
 
-async def validate_servers(all_servers):
-    """Validate and filter MCP servers, returning only successful ones"""
-    successful_servers = {}
-    for server_name, server_config in all_servers.items():
+async def connect_servers(client, stack):
+    """Open a long-lived session per MCP server, dropping failing ones and returning the tools per server"""
+    server_tools = {}
+    # Sessions are opened one by one: a stdio transport has to be closed by the task that opened it
+    for server_name in list(client.connections):
         try:
-            test_client = MultiServerMCPClient({server_name: server_config})
-            await test_client.get_tools()
-            successful_servers[server_name] = server_config
+            # The session only moves to the app's stack once its tools loaded, a server that
+            # fails halfway has its subprocess closed right away instead of at shutdown
+            async with AsyncExitStack() as server_stack:
+                session = await server_stack.enter_async_context(
+                    client.session(server_name)
+                )
+                tools = await load_mcp_tools(session)
+                stack.push_async_exit(server_stack.pop_all())
+            server_tools[server_name] = tools
             print(f"Successfully loaded: {server_name}")
         except Exception as e:
+            # Drop the failing server so the client only keeps working connections
+            del client.connections[server_name]
             print(f"Failed to load {server_name}: {e}")
-    return successful_servers
+    return server_tools
 
 
-async def setup_langgraph_app():
-    """Setup the LangGraph app with MCP tools"""
+async def setup_langgraph_app(stack):
+    """Setup the LangGraph app with MCP tools, keeping their sessions open on the exit stack"""
     current_dir = Path(__file__).parent
 
     # Define all MCP servers (local + external packages)
@@ -115,18 +130,22 @@ async def setup_langgraph_app():
         },
     }
 
-    # Validate servers - only load ones that work
-    successful_servers = await validate_servers(all_servers)
+    # Connect to the servers - only load ones that work
+    client = MultiServerMCPClient(all_servers)
+    server_tools = await connect_servers(client, stack)
 
-    if successful_servers:
-        client = MultiServerMCPClient(successful_servers)
-        tools = await client.get_tools()
+    if server_tools:
+        tools = [tool for loaded in server_tools.values() for tool in loaded]
 
-        print(f"\nLoaded {len(tools)} tools from {len(successful_servers)} server(s):")
-        for tool in tools:
-            print(f"  - {tool.name}: {tool.description}")
+        print(f"\nLoaded {len(tools)} tools from {len(server_tools)} server(s):")
+        # One write for the whole listing instead of a print per tool
+        print("\n".join(f"  - {tool.name}: {tool.description}" for tool in tools))
 
-        return build_graph(tools)
+        # The saver's connection is closed together with the MCP sessions at shutdown
+        checkpointer = await stack.enter_async_context(
+            AsyncSqliteSaver.from_conn_string(CHECKPOINT_DB)
+        )
+        return build_graph(tools, checkpointer)
     else:
         print("No servers loaded! Terminating.")
         raise RuntimeError("No MCP servers available")
@@ -134,8 +153,11 @@ async def setup_langgraph_app():
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
-    app.state.langgraph_app = await setup_langgraph_app()
-    yield
+    # Keep the MCP sessions (and their stdio subprocesses) open for the app's lifetime,
+    # instead of spawning a new subprocess for every tool call
+    async with AsyncExitStack() as stack:
+        app.state.langgraph_app = await setup_langgraph_app(stack)
+        yield
 
 
 app = FastAPI(lifespan=lifespan)
@@ -151,11 +173,11 @@ def root():
 
 
 @app.post("/chat")
-async def chat_endpoint(
-    request: Request, user_input: str = Form(...), thread_id: str = Form(None)
-):
-    print("Received user_input:", user_input)
-    return await chat_endpoint_handler(request, user_input, thread_id, VERBOSE)
+async def chat_endpoint(request: Request, body: ChatRequest):
+    print("Received user_input:", body.user_input)
+    return await chat_endpoint_handler(
+        request, body.user_input, body.thread_id, VERBOSE
+    )
 
 
 if __name__ == "__main__":
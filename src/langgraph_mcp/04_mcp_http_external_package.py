@@ -1,18 +1,19 @@
-from fastapi import FastAPI, Form, Request
+from fastapi import FastAPI, Request
 from fastapi.responses import RedirectResponse
 from fastapi.staticfiles import StaticFiles
+import asyncio
 import os
-from contextlib import asynccontextmanager
+from contextlib import asynccontextmanager, AsyncExitStack
 from langchain_core.messages import SystemMessage
 from langgraph.graph import StateGraph, START
 from langgraph.prebuilt import tools_condition, ToolNode
-from pydantic import BaseModel
-from typing import Annotated, List
+from typing import Annotated, List, TypedDict
 from langgraph.graph.message import add_messages
-from langgraph.checkpoint.memory import MemorySaver
+from langgraph.checkpoint.sqlite.aio import AsyncSqliteSaver
 from langchain_mcp_adapters.client import MultiServerMCPClient
-from langgraph_mcp.configuration import get_llm
+from langgraph_mcp.configuration import get_llm_with_tools
 from langgraph_mcp.streaming_utils import (
+    ChatRequest,
     chat_endpoint_handler,
     truncate_messages_safely,
 )
@@ -33,18 +34,16 @@ Example:
 # put verbose to true to see chat and tool results in terminal
 VERBOSE = True
 
+# SQLite file the conversation checkpoints are stored in (survives restarts, shared by workers),
+# by default in the repository root whatever directory the app is started from
+CHECKPOINT_DB = os.getenv(
+    "CHECKPOINT_DB",
+    os.path.join(os.path.dirname(__file__), "..", "..", "checkpoints.db"),
+)
 
-# Define the state of the graph
-class MessageState(BaseModel):
-    messages: Annotated[List, add_messages]
-
-
-def create_assistant(llm_with_tools):
-    """Create an assistant function with access to the LLM"""
-
-    # System prompt to guide the LLM on using tools effectively
-    system_prompt = SystemMessage(
-        content="""You are a helpful AI assistant for the website "Vibify.up.railway.app". 
+# System prompt to guide the LLM on using tools effectively (built once, shared by all requests)
+SYSTEM_PROMPT = SystemMessage(
+    content="""You are a helpful AI assistant for the website "Vibify.up.railway.app". 
                     When greeting users, mention the website link.
                     This is a Spotify clone, but do not mention that. 
                     You have access to the following types of tools:
@@ -98,27 +97,33 @@ def create_assistant(llm_with_tools):
                 - Write URLs as plain text (e.g., "Link: https://example.com" not "[text](url)")
                 - Do NOT use emojis
                 """
-    )
+)
+
+
+# Define the state of the graph
+class MessageState(TypedDict):
+    messages: Annotated[List, add_messages]
+
+
+def create_assistant(llm_with_tools):
+    """Create an assistant function with access to the LLM"""
 
     async def assistant(state: MessageState):
         # Always ensure system message is first (remove any existing system messages first)
-        messages = state.messages
+        messages = state["messages"]
         # Remove system messages and truncate msg history to preserve token usage
         messages = truncate_messages_safely(messages)
 
-        # Always prepend system message
-        messages = [system_prompt] + messages
-
-        response = await llm_with_tools.ainvoke(messages)
+        # Always prepend system message (single tuple build instead of list concatenation)
+        response = await llm_with_tools.ainvoke((SYSTEM_PROMPT, *messages))
         return {"messages": [response]}
 
     return assistant
 
 
-def build_graph(tools):
+def build_graph(tools, checkpointer):
     """Build and return the LangGraph ReAct agent with MCP tools"""
-    llm = get_llm("openai")
-    llm_with_tools = llm.bind_tools(tools)
+    llm_with_tools = get_llm_with_tools(tools, "openai")
 
     builder = StateGraph(MessageState)
     builder.add_node("assistant", create_assistant(llm_with_tools))
@@ -128,32 +133,44 @@ def build_graph(tools):
     builder.add_conditional_edges("assistant", tools_condition)
     builder.add_edge("tools", "assistant")
 
-    memory = MemorySaver()
-    return builder.compile(checkpointer=memory)
+    return builder.compile(checkpointer=checkpointer)
 
 
-async def validate_servers(all_servers):
-    """Validate and filter MCP servers, returning only successful ones"""
+async def validate_servers(client):
+    """Validate the client's MCP servers, dropping failing ones and returning the tools per server"""
     import traceback
 
-    successful_servers = {}
-    for server_name, server_config in all_servers.items():
+    async def probe(server_name):
         try:
-            print(
-                f"Testing connection to {server_name} at {server_config.get('url', 'stdio')}..."
-            )
-            test_client = MultiServerMCPClient({server_name: server_config})
-            await test_client.get_tools()
-            successful_servers[server_name] = server_config
-            print(f"Successfully loaded: {server_name}")
+            # No long-lived session: each tool call opens its own HTTP session, so a remote
+            # server that redeploys or expires sessions doesn't break the tools until a restart
+            return await client.get_tools(server_name=server_name), None
         except Exception as e:
-            print(f"Failed to load {server_name}: {e}")
-            print(f"   Full traceback:\n{traceback.format_exc()}")
-    return successful_servers
+            return None, e
+
+    server_names = list(client.connections)
+    for server_name, server_config in client.connections.items():
+        print(
+            f"Testing connection to {server_name} at {server_config.get('url', 'stdio')}..."
+        )
+    # Probe all servers concurrently, so startup only waits for the slowest one
+    results = await asyncio.gather(*(probe(name) for name in server_names))
+
+    server_tools = {}
+    for server_name, (tools, error) in zip(server_names, results):
+        if error is None:
+            server_tools[server_name] = tools
+            print(f"Successfully loaded: {server_name}")
+        else:
+            # Drop the failing server so the client only keeps working connections
+            del client.connections[server_name]
+            print(f"Failed to load {server_name}: {error}")
+            print(f"   Full traceback:\n{''.join(traceback.format_exception(error))}")
+    return server_tools
 
 
-async def setup_langgraph_app():
-    """Setup the LangGraph app with MCP tools"""
+async def setup_langgraph_app(stack):
+    """Setup the LangGraph app with MCP tools, keeping the checkpointer open on the exit stack"""
 
     # Define MCP servers
     all_servers = {
@@ -171,18 +188,22 @@ async def setup_langgraph_app():
         # },
     }
 
-    # Validate server connection
-    successful_servers = await validate_servers(all_servers)
+    # Connect to the servers - only load ones that work
+    client = MultiServerMCPClient(all_servers)
+    server_tools = await validate_servers(client)
 
-    if successful_servers:
-        client = MultiServerMCPClient(successful_servers)
-        tools = await client.get_tools()
+    if server_tools:
+        tools = [tool for loaded in server_tools.values() for tool in loaded]
 
-        print(f"\nLoaded {len(tools)} tools from {len(successful_servers)} server(s):")
-        for tool in tools:
-            print(f"  - {tool.name}: {tool.description}")
+        print(f"\nLoaded {len(tools)} tools from {len(server_tools)} server(s):")
+        # One write for the whole listing instead of a print per tool
+        print("\n".join(f"  - {tool.name}: {tool.description}" for tool in tools))
 
-        return build_graph(tools)
+        # The saver's connection is closed at shutdown
+        checkpointer = await stack.enter_async_context(
+            AsyncSqliteSaver.from_conn_string(CHECKPOINT_DB)
+        )
+        return build_graph(tools, checkpointer)
     else:
         print("No servers loaded! Terminating.")
         raise RuntimeError("No MCP servers available")
@@ -190,8 +211,9 @@ async def setup_langgraph_app():
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
-    app.state.langgraph_app = await setup_langgraph_app()
-    yield
+    async with AsyncExitStack() as stack:
+        app.state.langgraph_app = await setup_langgraph_app(stack)
+        yield
 
 
 app = FastAPI(lifespan=lifespan)
@@ -207,11 +229,11 @@ def root():
 
 
 @app.post("/chat")
-async def chat_endpoint(
-    request: Request, user_input: str = Form(...), thread_id: str = Form(None)
-):
-    print("Received user_input:", user_input)
-    return await chat_endpoint_handler(request, user_input, thread_id, VERBOSE)
+async def chat_endpoint(request: Request, body: ChatRequest):
+    print("Received user_input:", body.user_input)
+    return await chat_endpoint_handler(
+        request, body.user_input, body.thread_id, VERBOSE
+    )
 
 
 if __name__ == "__main__":
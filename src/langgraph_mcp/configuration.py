@@ -1,15 +1,19 @@
 from langchain_ollama import ChatOllama
 from langchain_openai import AzureChatOpenAI
 import os
+import json
+import functools
+from collections import OrderedDict
 from dotenv import load_dotenv
 
 # Load environment variables from .env file
 load_dotenv()
 
 
+@functools.lru_cache(maxsize=4)
 def get_llm(llm_type="openai"):
     """
-    Returns an LLM instance.
+    Returns an LLM instance, shared per llm_type so its HTTP client (and keep-alive) is reused.
     llm_type: "qwen" (default) or "openai"
     """
     if llm_type == "openai":
@@ -24,6 +28,45 @@ def get_llm(llm_type="openai"):
         return ChatOllama(model="qwen3:8b")
 
 
+def toolset_key(tools):
+    """
+    Returns a hashable key for a toolset, used to cache what is built from it.
+    Tools count as the same when their name, description and argument schema match.
+    """
+    return tuple(
+        sorted(
+            (
+                tool.name,
+                tool.description,
+                json.dumps(tool.args, sort_keys=True, default=str),
+            )
+            for tool in tools
+        )
+    )
+
+
+# Bound LLMs keyed by (llm_type, toolset), least recently used first, so rebuilding a graph
+# reuses the tool schemas; bounded like get_llm so changing toolsets can't grow it forever
+_MAX_BOUND_LLMS = 4
+_bound_llms = OrderedDict()
+
+
+def get_llm_with_tools(tools, llm_type="openai"):
+    """
+    Returns an LLM instance with the tools bound to it.
+    Reuses the earlier binding when the same toolset (name, description and argument schema)
+    is passed again.
+    """
+    key = (llm_type, toolset_key(tools))
+    if key in _bound_llms:
+        _bound_llms.move_to_end(key)
+    else:
+        _bound_llms[key] = get_llm(llm_type).bind_tools(tools)
+        if len(_bound_llms) > _MAX_BOUND_LLMS:
+            _bound_llms.popitem(last=False)
+    return _bound_llms[key]
+
+
 if __name__ == "__main__":
     llm = get_llm(llm_type="openai")
     print(llm.invoke("Hello, how are you?").content)
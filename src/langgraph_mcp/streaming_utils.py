@@ -2,6 +2,7 @@
 
 from fastapi import Request
 from fastapi.responses import StreamingResponse
+from pydantic import BaseModel
 from langchain_core.messages import (
     HumanMessage,
     ToolMessage,
@@ -9,98 +10,261 @@ from langchain_core.messages import (
     SystemMessage,
     AnyMessage,
 )
+import asyncio
+import json
 import uuid
 import re
-import json
+import time
+import orjson
+from types import MappingProxyType
+from contextlib import aclosing
+
+# Read-only default for missing event payloads, shared instead of allocating {} per event
+_EMPTY = MappingProxyType({})
+
+# astream_events types handled after the token fast path, everything else is skipped early
+_HANDLED_EVENTS = frozenset(
+    {
+        "on_tool_start",
+        "on_tool_end",
+        "on_chain_end",
+        "on_chat_model_start",
+    }
+)
+
+# <untrusted-data-{uuid}>...</untrusted-data-{uuid}> wrapper used by the Supabase MCP server
+_UNTRUSTED_DATA_RE = re.compile(
+    r"<untrusted-data-([^>]+)>(.*?)</untrusted-data-\1>", re.DOTALL
+)
+# Verbose text in front of the first JSON bracket
+_LEADING_TEXT_RE = re.compile(r"^[^[{]*")
+
+# Run types whose events create_event_stream consumes, astream_events filters out the rest
+_STREAMED_RUN_TYPES = ["chat_model", "tool", "chain"]
+
+# orjson turns integers beyond 64 bits into floats and rejects NaN/Infinity; tool output that may
+# contain those is parsed and printed with the json module so values display unchanged
+_STDLIB_JSON_RE = re.compile(r"\d{19,}|NaN|Infinity")
+
+# First characters of the JSON values worth parsing (true/false/null print the same unparsed)
+_JSON_FIRST_CHARS = frozenset('{["-0123456789')
+
+# Token chunks are flushed once this many bytes are buffered, or the oldest is this old
+_FLUSH_BYTES = 4096
+_FLUSH_SECONDS = 0.02
+
+# Tool outputs longer than this are cleaned in a worker thread instead of on the event loop
+_CLEAN_IN_THREAD_CHARS = 16384
+
+# Max graph events buffered ahead of the client, and the end-of-stream sentinel
+_EVENT_QUEUE_SIZE = 64
+_STREAM_END = object()
+
+# After this long without graph events (e.g. a slow tool call) a keepalive is sent so proxies
+# don't drop the idle connection; a single NUL byte can't be split across reads, chat.js strips it
+_KEEPALIVE_SECONDS = 15
+_KEEPALIVE = b"\0"
+
+# Markers parsed by static/chat.js, pre-encoded because the stream yields bytes
+_TOOL_CALL_MARKER = b"\n__TOOL_CALL__:Calling tool '"
+_TOOL_RESULT_MARKER = b"\n__TOOL_CALL_RESULT__:Tool '"
+_FINAL_MARKER = b"\n__FINAL__:"
 
 
 async def create_event_stream(
     langgraph_app, user_input: str, thread_id: str, verbose: bool = False
 ):
-    """Create an async generator that streams LangGraph events to the frontend"""
+    """Create an async generator that streams LangGraph events to the frontend as UTF-8 bytes"""
     config = {"configurable": {"thread_id": thread_id}}
     tool_results_shown = set()
     tool_calls_shown = set()
     final_message = None
     last_printed_index = -1
     messages_printed = set()
-
-    async for event in langgraph_app.astream_events(
-        {"messages": [HumanMessage(content=user_input)]}, config=config
-    ):
-        event_type = event.get("event")
-
-        if event_type == "on_chat_model_start" and verbose:
-            run_id = event.get("run_id")
-            if run_id and run_id not in messages_printed:
-                messages_printed.add(run_id)
-                data = event.get("data", {})
-                input_data = data.get("input")
-                if isinstance(input_data, list):
-                    messages = input_data
-                elif isinstance(input_data, dict):
-                    messages = input_data.get("messages", [])
+    # Token chunks not yet sent to the client
+    pending_tokens = []
+    pending_size = 0
+    pending_since = 0.0
+
+    # The graph runs in its own task and hands events over through a bounded queue,
+    # so it is paused instead of piling up events while the client reads slowly
+    events = asyncio.Queue(maxsize=_EVENT_QUEUE_SIZE)
+    producer = asyncio.create_task(
+        _pump_events(
+            langgraph_app.astream_events(
+                {"messages": [HumanMessage(content=user_input)]},
+                config=config,
+                version="v2",
+                # Only emit the run types read below (model tokens, tools, the graph itself)
+                include_types=_STREAMED_RUN_TYPES,
+            ),
+            events,
+        )
+    )
+    try:
+        while True:
+            # Buffered tokens only wait out the rest of their flush window, an idle stream
+            # waits for the keepalive interval
+            if pending_tokens:
+                timeout = _FLUSH_SECONDS - (time.monotonic() - pending_since)
+            else:
+                timeout = _KEEPALIVE_SECONDS
+            try:
+                event = await asyncio.wait_for(events.get(), max(timeout, 0))
+            except TimeoutError:
+                if pending_tokens:
+                    yield b"".join(pending_tokens)
+                    pending_tokens.clear()
+                    pending_size = 0
                 else:
-                    messages = data.get("messages", [])
-
-                if messages and isinstance(messages, list):
-                    while (
-                        messages
-                        and len(messages) == 1
-                        and isinstance(messages[0], list)
-                    ):
-                        messages = messages[0]
-                    if messages and len(messages) > 0:
-                        _print_message_sequence(messages, skip_final_separator=True)
-                        last_printed_index = len(messages) - 1
-
-        if event_type == "on_chat_model_stream":
-            chunk = event["data"]["chunk"]
-            if hasattr(chunk, "content") and chunk.content:
-                yield chunk.content + " "
-
-        # Tool calls
-        if event_type == "on_tool_start":
-            tool_name = event.get("name", "tool")
-            tool_args = event.get("data", {}).get("input", {})
-            # Use run_id to deduplicate tool calls
-            tool_run_id = event.get("run_id")
-            if tool_run_id and tool_run_id not in tool_calls_shown:
-                tool_calls_shown.add(tool_run_id)
-                yield f"\n__TOOL_CALL__:Calling tool '{tool_name}' with args {tool_args}\n"
-
-        if event_type == "on_tool_end":
-            tool_name = event.get("name", "tool")
-            # LangGraph on_tool_end events have run_id at the top level (unique UUID per tool call)
-            tool_id = event.get("run_id")
-            tool_output = event.get("data", {}).get("output", "")
-
-            if isinstance(tool_output, ToolMessage):
-                tool_output = tool_output.content
-
-            tool_output = _clean_tool_output(str(tool_output))
-
-            if tool_id not in tool_results_shown:
-                yield f"\n__TOOL_CALL_RESULT__:Tool '{tool_name}' returned: {tool_output}\n"
-                tool_results_shown.add(tool_id)
-
-        if event_type == "on_chain_end" and final_message is None:
-            event_name = event.get("name", "")
-            tags = event.get("tags", {})
-            if event_name in ("LangGraph", "") and "node" not in tags:
-                messages = event.get("data", {}).get("output", {}).get("messages", [])
-                if messages:
-                    final_message = _extract_final_message(messages)
-                    if final_message and verbose:
-                        final_index = last_printed_index + 1
-                        content_preview = " ".join(final_message.split())[:50]
-                        print(
-                            f"  [{final_index}] AIMessage: content='{content_preview}...'"
+                    yield _KEEPALIVE
+                continue
+            if event is _STREAM_END:
+                break
+            if isinstance(event, Exception):
+                raise event
+
+            event_type = event["event"]
+
+            # Token chunks make up most of the stream: batch them into fewer, larger writes
+            if event_type == "on_chat_model_stream":
+                # One lookup per token; tool-call deltas carry empty content and are skipped here
+                content = getattr(event["data"]["chunk"], "content", None)
+                if content:
+                    token = content.encode()
+                    if not pending_tokens:
+                        pending_since = time.monotonic()
+                    pending_tokens.append(token)
+                    pending_size += len(token)
+                # Checked on empty deltas too, so a long streamed tool call can't hold back text
+                if pending_tokens and (
+                    pending_size >= _FLUSH_BYTES
+                    or time.monotonic() - pending_since >= _FLUSH_SECONDS
+                ):
+                    yield b"".join(pending_tokens)
+                    pending_tokens.clear()
+                    pending_size = 0
+                continue
+
+            # Any other event ends a run of tokens, flush them before tool calls/results
+            if pending_tokens:
+                yield b"".join(pending_tokens)
+                pending_tokens.clear()
+                pending_size = 0
+
+            # Most events (chain/node starts, streams of intermediate chains, ...) are not used
+            if event_type not in _HANDLED_EVENTS:
+                continue
+            # Bind the payload once, falling back to a shared empty mapping
+            data = event.get("data") or _EMPTY
+
+            # Tool calls
+            if event_type == "on_tool_start":
+                tool_name = event.get("name", "tool")
+                tool_args = data.get("input") or {}
+                # Use run_id to deduplicate tool calls
+                tool_run_id = event.get("run_id")
+                if tool_run_id and tool_run_id not in tool_calls_shown:
+                    tool_calls_shown.add(tool_run_id)
+                    yield (
+                        _TOOL_CALL_MARKER
+                        + tool_name.encode()
+                        + b"' with args "
+                        + orjson.dumps(tool_args, default=str)
+                        + b"\n"
+                    )
+
+            elif event_type == "on_tool_end":
+                tool_name = event.get("name", "tool")
+                # LangGraph on_tool_end events have run_id at the top level (unique UUID per tool call)
+                tool_id = event.get("run_id")
+
+                if tool_id not in tool_results_shown:
+                    tool_output = data.get("output", "")
+                    if isinstance(tool_output, ToolMessage):
+                        tool_output = tool_output.content
+                    tool_output = str(tool_output)
+                    # Reformatting large outputs (e.g. big query results) would stall the event loop
+                    if len(tool_output) > _CLEAN_IN_THREAD_CHARS:
+                        tool_output = await asyncio.to_thread(
+                            _clean_tool_output, tool_output
                         )
-                        print(f"{'='*60}\n")
-
+                    else:
+                        tool_output = _clean_tool_output(tool_output)
+
+                    yield (
+                        _TOOL_RESULT_MARKER
+                        + f"{tool_name}' returned: {tool_output}\n".encode()
+                    )
+                    tool_results_shown.add(tool_id)
+
+            elif event_type == "on_chain_end" and final_message is None:
+                event_name = event.get("name", "")
+                tags = event.get("tags", ())
+                if event_name in ("LangGraph", "") and "node" not in tags:
+                    output = data.get("output")
+                    messages = (
+                        output.get("messages") if isinstance(output, dict) else None
+                    )
+                    if messages:
+                        final_message = _extract_final_message(messages)
+                        if final_message and verbose:
+                            final_index = last_printed_index + 1
+                            content_preview = " ".join(final_message.split())[:50]
+                            print(
+                                f"  [{final_index}] AIMessage: content='{content_preview}...'"
+                            )
+                            print(f"{'='*60}\n")
+
+            elif event_type == "on_chat_model_start" and verbose:
+                run_id = event.get("run_id")
+                if run_id and run_id not in messages_printed:
+                    messages_printed.add(run_id)
+                    input_data = data.get("input")
+                    if isinstance(input_data, list):
+                        messages = input_data
+                    elif isinstance(input_data, dict):
+                        messages = input_data.get("messages", [])
+                    else:
+                        messages = data.get("messages", [])
+
+                    if messages and isinstance(messages, list):
+                        while (
+                            messages
+                            and len(messages) == 1
+                            and isinstance(messages[0], list)
+                        ):
+                            messages = messages[0]
+                        if messages and len(messages) > 0:
+                            _print_message_sequence(messages, skip_final_separator=True)
+                            last_printed_index = len(messages) - 1
+    finally:
+        # Stops the graph when the client disconnects mid-stream
+        producer.cancel()
+
+    if pending_tokens:
+        yield b"".join(pending_tokens)
     if final_message:
-        yield f"\n__FINAL__:{final_message}"
+        yield _FINAL_MARKER + final_message.encode()
+
+
+async def _pump_events(stream, events: asyncio.Queue):
+    """Move graph events into the queue, ending with _STREAM_END or the raised exception"""
+    try:
+        async with aclosing(stream):
+            async for event in stream:
+                await events.put(event)
+    except Exception as e:
+        await events.put(e)
+    else:
+        await events.put(_STREAM_END)
+
+
+class ChatRequest(BaseModel):
+    """JSON body of the /chat endpoint"""
+
+    user_input: str
+    thread_id: str | None = None
 
 
 async def chat_endpoint_handler(
@@ -114,7 +278,9 @@ async def chat_endpoint_handler(
     langgraph_app = request.app.state.langgraph_app
     return StreamingResponse(
         create_event_stream(langgraph_app, user_input, thread_id, verbose),
-        media_type="text/plain",
+        media_type="text/plain; charset=utf-8",
+        # Stop reverse proxies (nginx, Railway, ...) from buffering the stream
+        headers={"X-Accel-Buffering": "no", "Cache-Control": "no-cache"},
     )
 
 
@@ -123,52 +289,72 @@ def _clean_tool_output(tool_output: str) -> str:
     Extract and pretty-print JSON content from Supabase MCP tool output.
     MCP server wraps tool results in JSON.stringify().
     """
-    # Parse outer JSON (MCP server wraps all results in JSON.stringify)
-    try:
-        outer_parsed = json.loads(tool_output)
-        if isinstance(outer_parsed, str):
-            inner_output = outer_parsed
+    inner_output = tool_output
+    # Parse outer JSON (MCP server wraps all results in JSON.stringify), plain text is skipped
+    if _looks_like_json(tool_output):
+        try:
+            outer_parsed = _loads_json(tool_output)
+        except json.JSONDecodeError:
+            pass
         else:
-            return json.dumps(outer_parsed, indent=2)
-    except (json.JSONDecodeError, ValueError):
-        inner_output = tool_output
+            if not isinstance(outer_parsed, str):
+                return _pretty_json(outer_parsed, tool_output)
+            inner_output = outer_parsed
 
     # Extract JSON from <untrusted-data> tags if present
-    uuid_match = re.search(r"<untrusted-data-([^>]+)>", inner_output)
-    if uuid_match:
-        uuid = uuid_match.group(1)
-        pattern = rf"<untrusted-data-{re.escape(uuid)}>(.*?)</untrusted-data-{re.escape(uuid)}>"
-        match = re.search(pattern, inner_output, re.DOTALL)
-        if match:
-            # Extract JSON data between tags, removing any verbose text before/after
-            json_data = match.group(1).strip()
-            json_data = re.sub(r"^[^[{]*", "", json_data)
-            last_bracket = max(json_data.rfind("]"), json_data.rfind("}"))
-            if last_bracket >= 0:
-                json_data = json_data[: last_bracket + 1]
-            json_data = json_data.strip()
-            try:
-                parsed_json = json.loads(json_data)
-                return json.dumps(parsed_json, indent=2)
-            except (json.JSONDecodeError, ValueError):
-                return json_data
+    match = _UNTRUSTED_DATA_RE.search(inner_output)
+    if match:
+        # Extract JSON data between tags, removing any verbose text before/after
+        json_data = match.group(2).strip()
+        json_data = _LEADING_TEXT_RE.sub("", json_data)
+        last_bracket = max(json_data.rfind("]"), json_data.rfind("}"))
+        if last_bracket >= 0:
+            json_data = json_data[: last_bracket + 1]
+        json_data = json_data.strip()
+        try:
+            return _pretty_json(_loads_json(json_data), json_data)
+        except json.JSONDecodeError:
+            return json_data
 
-    # Try to parse as JSON
-    try:
-        parsed_json = json.loads(inner_output)
-        return json.dumps(parsed_json, indent=2)
-    except (json.JSONDecodeError, ValueError):
-        return inner_output
+    # Try to parse the unwrapped string as JSON (the raw output already failed to parse)
+    if inner_output is not tool_output and _looks_like_json(inner_output):
+        try:
+            return _pretty_json(_loads_json(inner_output), inner_output)
+        except json.JSONDecodeError:
+            pass
+    return inner_output
+
+
+def _looks_like_json(text: str) -> bool:
+    """Cheap check whether text can be a JSON object, array, string or number"""
+    return text.lstrip()[:1] in _JSON_FIRST_CHARS
+
+
+def _needs_stdlib_json(text: str) -> bool:
+    """Whether text may hold values orjson reads differently (integers beyond 64 bits, NaN)"""
+    return _STDLIB_JSON_RE.search(text) is not None
+
+
+def _loads_json(text: str):
+    """Parse JSON with orjson, or with json when orjson would change the values"""
+    if _needs_stdlib_json(text):
+        return json.loads(text)
+    return orjson.loads(text)
+
+
+def _pretty_json(parsed, text: str) -> str:
+    """Serialize JSON parsed from text with 2-space indentation, using the same module"""
+    if _needs_stdlib_json(text):
+        return json.dumps(parsed, indent=2, ensure_ascii=False)
+    return orjson.dumps(parsed, option=orjson.OPT_INDENT_2).decode()
 
 
 def _extract_final_message(messages: list) -> str | None:
     """Extract final AIMessage with finish_reason='stop' from message list"""
+    # The graph appends the final reply last, so this normally returns on the first message
     for msg in reversed(messages):
         if isinstance(msg, AIMessage) and msg.content:
-            finish_reason = getattr(msg, "response_metadata", {}).get(
-                "finish_reason", ""
-            )
-            if finish_reason == "stop":
+            if msg.response_metadata.get("finish_reason") == "stop":
                 msg_content = str(msg.content)
                 if msg_content.strip():
                     return msg_content
@@ -100,13 +100,10 @@ function sendMessage(text, showUserBubble = true) {
 
     (async () => {
         try {
-            const formData = new URLSearchParams();
-            formData.append('user_input', text);
-            formData.append('thread_id', thread_id);
             const response = await fetch('/chat', {
                 method: 'POST',
-                headers: { 'Content-Type': 'application/x-www-form-urlencoded' },
-                body: formData.toString()
+                headers: { 'Content-Type': 'application/json' },
+                body: JSON.stringify({ user_input: text, thread_id: thread_id })
             });
             if (!response.ok) {
                 aiMsgDiv.innerHTML = linkifyText('[Error: ' + response.status + ']');
@@ -248,7 +245,8 @@ function sendMessage(text, showUserBubble = true) {
                     const { value, done } = await reader.read();
                     
                     if (value) {
-                        buffer += decoder.decode(value, { stream: true });
+                        // Drop the keepalive NUL bytes sent while the server waits on a slow tool
+                        buffer += decoder.decode(value, { stream: true }).replaceAll('\0', '');
                         processBuffer();
                     }
                     